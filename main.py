@@ -1,20 +1,42 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional, Set, Dict, Any
+from fastapi import FastAPI, HTTPException, Response
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import List, Optional, Dict, Any
+from collections import OrderedDict
 import httpx
-import json
+import msgspec
+import orjson
 import os
+from array import array
 from datetime import datetime
-import threading
-import time
 import asyncio
+import time
 
 CONFIG_PATH = "config.json"
+KNOWN_IDS_PATH = "known_ids.bin"  # known_issue_ids 的 sidecar（uint64 binary array）
 GITHUB_API_URL = "https://api.github.com/search/issues"
 
+# production 預設寫 compact JSON；要人眼讀 config.json 時設 GITSCOUT_PRETTY=1
+_PRETTY_CONFIG = os.environ.get("GITSCOUT_PRETTY") == "1"
+
 
 # ====== Models ======
 
+MAX_KNOWN_IDS = 10_000  # known_issue_ids 上限，超過就淘汰最舊的
+
+
+class BoundedIssueIds(OrderedDict):
+    """
+    有上限的「看過的 issue id」集合（id -> None）。
+    插入超過 MAX_KNOWN_IDS 時淘汰最舊的一筆；search 是 sort=updated，
+    舊 id 幾乎不會再出現，所以淘汰掉也不會重複通知。
+    """
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if len(self) > MAX_KNOWN_IDS:
+            self.popitem(last=False)
+
+
 class SearchConfig(BaseModel):
     organizations: List[str] = []    # org 或 user 名稱
     languages: List[str] = []        # python, typescript ...
@@ -29,12 +51,121 @@ class AppConfig(BaseModel):
     search: SearchConfig
     notif: NotificationConfig
     is_active: bool = False
-    known_issue_ids: Set[int] = set()
+    known_issue_ids: BoundedIssueIds = Field(default_factory=BoundedIssueIds)
     last_items: List[Dict[str, Any]] = []  # 最近一次抓到的 issues
 
+    # search 條件組好的 GitHub query 清單；只在 config 變動時重建，
+    # 不用每輪 poll 重組字串
+    _queries: List[str] = PrivateAttr(default_factory=list)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+# ====== config.json 的磁碟 schema（msgspec） ======
+# 解碼直接從 bytes 一趟做完 parse + 型別驗證（C 層），
+# 不用先 orjson.loads 再跑一次 Pydantic 驗證。
+# Pydantic model 留給 FastAPI 的 request body / 記憶體狀態用。
+
+class _SearchConfigSpec(msgspec.Struct):
+    organizations: List[str] = []
+    languages: List[str] = []
+    polling_interval: int = 120
+
+
+class _NotificationConfigSpec(msgspec.Struct):
+    webhook_url: Optional[str] = None
+
+
+class _AppConfigSpec(msgspec.Struct):
+    search: _SearchConfigSpec = msgspec.field(default_factory=_SearchConfigSpec)
+    notif: _NotificationConfigSpec = msgspec.field(default_factory=_NotificationConfigSpec)
+    is_active: bool = False
+
+
+_CONFIG_DECODER = msgspec.json.Decoder(_AppConfigSpec)
+_CONFIG_ENCODER = msgspec.json.Encoder()
+
+
+# ====== GitHub query 組字串 ======
+
+def _build_queries(cfg: AppConfig) -> List[str]:
+    """
+    組出要打 GitHub 的 query 清單。
+    每個 org/user 一條獨立 query（全部 AND 在同一條會互相限縮、
+    而且容易撞到 query 長度上限），沒設定時就全平台找一條。
+    """
+    parts: List[str] = []
+    for lang in cfg.search.languages:
+        parts.append(f"language:{lang}")
+    parts.append('label:"good first issue"')
+    base = " ".join(parts)
+
+    if not cfg.search.organizations:
+        return [base]
+
+    queries: List[str] = []
+    for name in cfg.search.organizations:
+        # org 跟 user 是不同 qualifier，各發一條才能同時涵蓋兩種帳號
+        queries.append(f"org:{name} {base}")
+        queries.append(f"user:{name} {base}")
+    return queries
+
+
+def _rebuild_queries(cfg: AppConfig) -> None:
+    cfg._queries = _build_queries(cfg)
+
 
 # ====== Config 讀寫 ======
 
+# 記憶體快取：stat 沒變就直接回傳上次 parse 好的 AppConfig，
+# 避免每個 request / 每輪 worker 都重新讀檔 + JSON decode。
+# 不需要 lock 的前提：worker 是 asyncio task，而且所有 endpoint 都是
+# async def（sync def 會被丟進 threadpool 跑，就會出現並發讀寫）。
+_cfg_cache: Dict[str, Any] = {"stat": None, "cfg": None}
+
+_KNOWN_IDS_ITEMSIZE = array("Q").itemsize
+
+
+def _as_known_ids(ids) -> BoundedIssueIds:
+    known = BoundedIssueIds()
+    for iid in ids:
+        known[iid] = None
+    return known
+
+
+def _load_known_ids() -> BoundedIssueIds:
+    if not os.path.exists(KNOWN_IDS_PATH):
+        return BoundedIssueIds()
+    arr = array("Q")
+    with open(KNOWN_IDS_PATH, "rb") as f:
+        arr.fromfile(f, os.path.getsize(KNOWN_IDS_PATH) // arr.itemsize)
+    # 檔案照插入順序存，依序塞回去讓淘汰順序維持「最舊優先」
+    # （log 比上限長時，BoundedIssueIds 的淘汰自然只留最近的那批）
+    return _as_known_ids(arr)
+
+
+def _rewrite_known_ids(known: BoundedIssueIds) -> None:
+    """把目前留著的 ids 完整重寫進 sidecar（原子性換檔）。"""
+    tmp_path = KNOWN_IDS_PATH + ".tmp"
+    with open(tmp_path, "wb") as f:
+        array("Q", known.keys()).tofile(f)
+    os.replace(tmp_path, KNOWN_IDS_PATH)
+
+
+def _append_known_ids(known: BoundedIssueIds, new_ids) -> None:
+    """
+    known_ids.bin 是 append-only log：每輪只把「新」id 附加到檔尾，
+    寫入成本 O(新 id 數) 而不是 O(全部)。log 長超過上限兩倍時
+    compact 成目前還留著的 ids。
+    """
+    with open(KNOWN_IDS_PATH, "ab") as f:
+        array("Q", new_ids).tofile(f)
+
+    if os.path.getsize(KNOWN_IDS_PATH) > 2 * MAX_KNOWN_IDS * _KNOWN_IDS_ITEMSIZE:
+        _rewrite_known_ids(known)
+
+
 def load_config() -> AppConfig:
     if not os.path.exists(CONFIG_PATH):
         # 預設空設定
@@ -42,25 +173,79 @@ def load_config() -> AppConfig:
             search=SearchConfig(),
             notif=NotificationConfig(),
             is_active=False,
-            known_issue_ids=set(),
+            known_issue_ids=BoundedIssueIds(),
             last_items=[]
         )
+        _rebuild_queries(default)
         save_config(default)
         return default
 
-    with open(CONFIG_PATH, "r") as f:
-        raw = json.load(f)
-
-    raw["known_issue_ids"] = set(raw.get("known_issue_ids", []))
-    raw["last_items"] = raw.get("last_items", [])
-    return AppConfig(**raw)
+    st = os.stat(CONFIG_PATH)
+    stat_key = (st.st_mtime_ns, st.st_size)
+    if _cfg_cache["stat"] == stat_key:
+        return _cfg_cache["cfg"]
+
+    with open(CONFIG_PATH, "rb") as f:
+        data = f.read()
+    spec = _CONFIG_DECODER.decode(data)
+
+    if os.path.exists(KNOWN_IDS_PATH):
+        known = _load_known_ids()
+    else:
+        # 相容舊格式：ids 還存在 config.json 裡（spec 會忽略未知欄位，
+        # 這裡才需要再 parse 一次拿 list）。馬上整批寫進 sidecar，
+        # 不然第一輪 poll 只會 append 新 id，重啟後舊 id 全部不見、
+        # 通知過的 issue 會被當成新的再發一次
+        known = _as_known_ids(orjson.loads(data).get("known_issue_ids", []))
+        if known:
+            _rewrite_known_ids(known)
+
+    # msgspec 已經驗證過型別，model_construct 直接組 instance，
+    # 不用再跑一次 Pydantic 驗證
+    cfg = AppConfig.model_construct(
+        search=SearchConfig.model_construct(
+            organizations=spec.search.organizations,
+            languages=spec.search.languages,
+            polling_interval=spec.search.polling_interval,
+        ),
+        notif=NotificationConfig.model_construct(webhook_url=spec.notif.webhook_url),
+        is_active=spec.is_active,
+        known_issue_ids=known,
+        last_items=[],
+    )
+    _rebuild_queries(cfg)
+
+    _cfg_cache["stat"] = stat_key
+    _cfg_cache["cfg"] = cfg
+    return cfg
 
 
 def save_config(cfg: AppConfig) -> None:
-    data = cfg.dict()
-    data["known_issue_ids"] = list(cfg.known_issue_ids)  # set 轉 list
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(data, f, indent=2)
+    # 手動組 dict，不走 cfg.dict()：那會把整個 known_issue_ids /
+    # last_items 都遞迴 deep copy 一份，然後我們又把它們丟掉。
+    # ids 存 sidecar binary、last_items 只留記憶體，JSON 只剩這三個欄位。
+    data = {
+        "search": cfg.search.model_dump(),
+        "notif": cfg.notif.model_dump(),
+        "is_active": cfg.is_active,
+    }
+
+    # 先寫 tmp 再 os.replace，寫到一半掛掉也不會留下壞掉的 config.json
+    buf = _CONFIG_ENCODER.encode(data)
+    if _PRETTY_CONFIG:
+        buf = msgspec.json.format(buf, indent=2)
+
+    tmp_path = CONFIG_PATH + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buf)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CONFIG_PATH)
+
+    # 剛寫入的內容是最新的，直接更新快取讓下次 load 不用 re-parse
+    st = os.stat(CONFIG_PATH)
+    _cfg_cache["stat"] = (st.st_mtime_ns, st.st_size)
+    _cfg_cache["cfg"] = cfg
 
 
 # ====== App & 全域 config ======
@@ -77,64 +262,71 @@ class UpdateConfigRequest(BaseModel):
 # ====== API ======
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok", "active": config.is_active}
 
 
 @app.post("/config")
-def update_config(body: UpdateConfigRequest):
+async def update_config(body: UpdateConfigRequest):
     global config
     config.search = body.search
     config.notif = body.notif
+    _rebuild_queries(config)
     save_config(config)
     return {"message": "config updated"}
 
 
 @app.post("/watch/start")
-def start_watch():
+async def start_watch():
     global config
     config.is_active = True
     save_config(config)
+    _worker_wake.set()  # 叫醒 worker 馬上開始
     return {"message": "watch started"}
 
 
 @app.post("/watch/stop")
-def stop_watch():
+async def stop_watch():
     global config
     config.is_active = False
     save_config(config)
+    _worker_wake.set()  # 叫醒 worker 讓停止立即生效
     return {"message": "watch stopped"}
 
 
+# /issues 回應的 JSON bytes 快取；last_items 更新時設回 None。
+# 讓熱門的讀取 endpoint 免去每個 request 重新 serialize。
+_issues_response_cache: Optional[bytes] = None
+
+
 @app.get("/issues")
-def get_issues():
+async def get_issues():
     """
     回傳最近一次 worker / 手動檢查時抓到的 issues。
     """
-    cfg = load_config()
-    return {"items": cfg.last_items}
+    global _issues_response_cache
+    if _issues_response_cache is None:
+        _issues_response_cache = orjson.dumps({"items": config.last_items})
+    return Response(content=_issues_response_cache, media_type="application/json")
 
 
 # ====== GitHub & Discord 邏輯 ======
 
-async def fetch_github_issues(cfg: AppConfig) -> List[Dict[str, Any]]:
-    # 組 query：org/user + language + good first issue
-    parts: List[str] = []
-
-    # org/user
-    for name in cfg.search.organizations:
-        parts.append(f"org:{name}")
-        parts.append(f"user:{name}")
+# 每條 query 的結果快取：
+# - ts：30 秒 TTL 內（worker 剛跑完又手動打 /cron/check 之類）直接回記憶體，
+#   連 HTTP 都不用發
+# - etag：TTL 過了就帶 If-None-Match 發 conditional request，
+#   304（無 body）代表內容沒變，省下載 + JSON parse，也不計入 rate limit
+# org 會拆成多條 query，所以用 q 當 key。
+_SEARCH_TTL = 30.0  # 秒
+_search_cache: Dict[str, Dict[str, Any]] = {}
 
-    # language
-    for lang in cfg.search.languages:
-        parts.append(f"language:{lang}")
 
-    # good first issue
-    parts.append('label:"good first issue"')
-
-    # 若沒設定 org/user，GitHub 會在全平台找
-    q = " ".join(parts) if parts else 'label:"good first issue"'
+async def _search_issues(client: httpx.AsyncClient, q: str) -> List[Dict[str, Any]]:
+    cached = _search_cache.get(q)
+    now = time.monotonic()  # monotonic 不受系統時鐘調整影響
+    if cached and now - cached["ts"] < _SEARCH_TTL:
+        return cached["items"]
 
     params = {
         "q": q,
@@ -143,14 +335,78 @@ async def fetch_github_issues(cfg: AppConfig) -> List[Dict[str, Any]]:
         "per_page": 50
     }
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(GITHUB_API_URL, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("items", [])
+    headers = {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+
+    resp = await client.get(GITHUB_API_URL, params=params, headers=headers)
+    if resp.status_code == 304:
+        # 內容沒變，直接用上次 parse 好的結果
+        cached["ts"] = now
+        return cached["items"]
+
+    resp.raise_for_status()
+    items = resp.json().get("items", [])
+
+    _search_cache[q] = {"etag": resp.headers.get("ETag"), "items": items, "ts": now}
+    return items
+
+
+async def fetch_github_issues(client: httpx.AsyncClient, cfg: AppConfig) -> List[Dict[str, Any]]:
+    # query 在 config 變動時就組好了，這裡直接拿（沒組過才 fallback）
+    queries = cfg._queries or _build_queries(cfg)
+
+    # 多條 query 併發打，network latency 重疊而不是相加
+    results = await asyncio.gather(
+        *[_search_issues(client, q) for q in queries],
+        return_exceptions=True,
+    )
+
+    ok: List[List[Dict[str, Any]]] = [r for r in results if not isinstance(r, BaseException)]
+    if not ok:
+        # 全部失敗才往上丟（部分失敗就用拿得到的結果）
+        raise results[0]
+
+    # 扁平化 + 依 id 去重（同一 issue 可能同時命中 org: 跟 user:）
+    merged = {it["id"]: it for items in ok for it in items if it.get("id") is not None}
+    return list(merged.values())
+
+
+def _project_issue(it: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    只留 /issues 跟 Discord 通知真正用到的欄位。
+    GitHub 回傳的 issue 有 ~30 個欄位（avatar、reactions...），
+    全存起來會讓 last_items 記憶體跟 serialize 成本多好幾倍。
+    """
+    return {
+        "id": it.get("id"),
+        "title": it.get("title"),
+        "html_url": it.get("html_url"),
+        "repository_url": it.get("repository_url"),
+        "state": it.get("state"),
+        "body": (it.get("body") or "")[:200],  # 先截好，通知時不用再切
+    }
+
+
+_REPO_URL_PREFIX = "https://api.github.com/repos/"
+_REPO_URL_PREFIX_LEN = len(_REPO_URL_PREFIX)
 
 
-async def send_discord_webhook(webhook_url: str, issues: List[Dict[str, Any]]):
+def _issue_embed(issue: Dict[str, Any]) -> Dict[str, Any]:
+    # prefix 固定，直接切片就好，不用 .replace() 掃整條字串
+    repo_full_name = issue.get("repository_url") or ""
+    if repo_full_name.startswith(_REPO_URL_PREFIX):
+        repo_full_name = repo_full_name[_REPO_URL_PREFIX_LEN:]
+    return {
+        "title": issue.get("title"),
+        "url": issue.get("html_url"),
+        "description": f"Repo: {repo_full_name}\nState: {issue.get('state')}\n\n{issue.get('body') or ''}...",
+        "color": 5814783,
+        "footer": {"text": "GitScout Notification"},
+    }
+
+
+async def send_discord_webhook(client: httpx.AsyncClient, webhook_url: str, issues: List[Dict[str, Any]]):
     if not webhook_url:
         return
 
@@ -158,34 +414,19 @@ async def send_discord_webhook(webhook_url: str, issues: List[Dict[str, Any]]):
     if count == 0:
         return
 
-    embeds = []
-    for issue in issues[:5]:
-        repo_full_name = issue.get("repository_url", "").replace(
-            "https://api.github.com/repos/", ""
-        )
-        body = issue.get("body") or ""
-        embeds.append(
-            {
-                "title": issue.get("title"),
-                "url": issue.get("html_url"),
-                "description": f"Repo: {repo_full_name}\nState: {issue.get('state')}\n\n{body[:200]}...",
-                "color": 5814783,
-                "footer": {"text": "GitScout Notification"},
-            }
-        )
+    embeds = [_issue_embed(issue) for issue in issues[:5]]
 
     payload = {
         "content": f"🚀 GitScout Alert: Found {count} new 'good first issue'{'' if count == 1 else 's'}!",
         "embeds": embeds,
     }
 
-    async with httpx.AsyncClient() as client:
-        await client.post(webhook_url, json=payload, timeout=10.0)
+    await client.post(webhook_url, json=payload)
 
 
 # ====== 核心檢查邏輯（worker & /cron 共用） ======
 
-async def run_check_once() -> Dict[str, Any]:
+async def run_check_once(client: httpx.AsyncClient) -> Dict[str, Any]:
     """
     只做一次 GitHub 檢查：
     - 若未啟用 watch，直接略過
@@ -197,26 +438,34 @@ async def run_check_once() -> Dict[str, Any]:
         return {"message": "watch inactive, skip"}
 
     try:
-        items = await fetch_github_issues(config)
+        items = await fetch_github_issues(client, config)
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"github error: {e}")
 
-    new_issues: List[Dict[str, Any]] = []
-    for it in items:
-        iid = it.get("id")
-        if iid is None:
-            continue
-        if iid not in config.known_issue_ids:
-            config.known_issue_ids.add(iid)
-            new_issues.append(it)
-
-    # 更新最後一次抓到的清單
+    # 瘦身：後面存的、發的都只需要少數欄位
+    items = [_project_issue(it) for it in items]
+
+    # 用 set 差集一次算出新 id，membership 測試都走 C 層，
+    # 不用對 50 筆 item 逐一做 Python-level 的 in + insert。
+    # known 綁成 local，避免重複走 Pydantic 的屬性 descriptor
+    known = config.known_issue_ids
+    ids = [it.get("id") for it in items]
+    new_ids = {i for i in ids if i is not None} - known.keys()
+    new_issues = [it for it, iid in zip(items, ids) if iid in new_ids]
+    for iid in new_ids:
+        known[iid] = None
+    if new_ids:
+        _append_known_ids(known, new_ids)
+
+    # 更新最後一次抓到的清單（只進記憶體）。新 id 已經 append 進
+    # sidecar log，config.json 的欄位 polling 不會動到，不用 save_config
+    global _issues_response_cache
     config.last_items = items
-    save_config(config)
+    _issues_response_cache = None  # 讓 /issues 下次重新 serialize
 
     # 發 Discord
     if new_issues and config.notif.webhook_url:
-        await send_discord_webhook(config.notif.webhook_url, new_issues)
+        await send_discord_webhook(client, config.notif.webhook_url, new_issues)
 
     result = {
         "checked_at": datetime.utcnow().isoformat() + "Z",
@@ -232,41 +481,64 @@ async def cron_check():
     """
     仍然保留這個 endpoint，方便你手動觸發或本機測試。
     """
-    return await run_check_once()
+    return await run_check_once(app.state.http)
 
 
-# ====== 背景 worker thread ======
+# ====== 背景 worker（asyncio task，跟 app 共用 event loop） ======
 
-def background_worker():
+# /watch/start、/watch/stop 用這個 event 立刻叫醒 worker，
+# 不用等到 polling_interval 睡滿才反應
+_worker_wake = asyncio.Event()
+
+
+async def background_worker():
     global config
     print("Background worker started")
     while True:
         try:
-            # 每輪讀一次最新 config（避免只用記憶體版本）
-            cfg = load_config()
-            # 更新 global config 參考
-            config.search = cfg.search
-            config.notif = cfg.notif
-            config.is_active = cfg.is_active
-            config.known_issue_ids = cfg.known_issue_ids
-            config.last_items = cfg.last_items
-
-            interval = max(cfg.search.polling_interval, 30)  # 最少 30 秒
-            if cfg.is_active:
-                # 用 asyncio.run 執行一次檢查
-                asyncio.run(run_check_once())
-            else:
+            # 暫停中就只看記憶體 flag（/watch/start 會直接改掉並叫醒我們），
+            # 連 config.json 都不用碰
+            if not config.is_active:
                 print("watch inactive, worker idle")
-
-            time.sleep(interval)
+                interval = max(config.search.polling_interval, 30)
+            else:
+                # 啟用中才每輪讀一次最新 config（避免只用記憶體版本）
+                cfg = load_config()
+                # 更新 global config 參考（is_active 以記憶體為準，
+                # start/stop endpoint 已經寫回檔案了）
+                config.search = cfg.search
+                config.notif = cfg.notif
+                config.known_issue_ids = cfg.known_issue_ids
+                config._queries = cfg._queries
+
+                interval = max(cfg.search.polling_interval, 30)  # 最少 30 秒
+                await run_check_once(app.state.http)
+
+            # 可被打斷的睡眠：watch 狀態一變就醒，否則睡滿 interval
+            try:
+                await asyncio.wait_for(_worker_wake.wait(), timeout=interval)
+                _worker_wake.clear()
+            except asyncio.TimeoutError:
+                pass
         except Exception as e:
             print("background worker error:", e)
             # 避免狂刷 log，出錯時暫停一段時間
-            time.sleep(30)
+            await asyncio.sleep(30)
 
 
 @app.on_event("startup")
-def start_background_worker():
-    t = threading.Thread(target=background_worker, daemon=True)
-    t.start()
-    print("Background worker thread launched")
+async def on_startup():
+    # 共用一個 AsyncClient：連線 keep-alive，省掉每次請求的 TCP/TLS 握手
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=10),
+    )
+    app.state.worker_task = asyncio.create_task(background_worker())
+    print("Background worker task launched")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.worker_task.cancel()
+    await app.state.http.aclose()